@@ -1,151 +1,31 @@
 import streamlit as st
 import pandas as pd
-import pulp
-from geopy.distance import geodesic
-import data
-
-def optimize_waste(user_df: pd.DataFrame, max_budget: float, origin_coords: tuple):
-    # Input waste quantity in tons; convert to kg
-    user_df = user_df.copy()
-    if 'Quantity' not in user_df.columns:
-        user_df['Quantity'] = 1.0
-    # Quantity in tons -> kg
-    user_df['Quantity_kg'] = user_df['Quantity'] * 1000.0
-
-    # Load static data (emission & cost per kg, capacity in kg)
-    treatments_df = data.treatments_df.copy()
-    transport_df  = data.transport_df.copy()
-    locations_df  = data.locations_df
-    capacity_df   = data.facility_capacity_df.copy()
-    facility_rules = data.facility_rules
-    max_prop_df   = data.max_prop_df
-
-    # Convert transport units: per ton -> per kg, and capacity ton -> kg
-    transport_df['Emission_per_kg'] = transport_df['Emission_per_ton'] / 1000.0
-    if 'Cost_per_ton' in transport_df.columns:
-        transport_df['Cost_per_kg'] = transport_df['Cost_per_ton'] / 1000.0
-    else:
-        transport_df['Cost_per_kg'] = 0.0
-    transport_df['Max_Capacity'] *= 1000.0
-
-    # Convert facility capacities from tons to kg
-    capacity_df['Capacity'] *= 1000.0
-
-    # Merge capacities with coordinates
-    facility_df = capacity_df.merge(locations_df, on='Facility_ID').rename(columns={'Capacity':'Max_Capacity'})
-
-    # Build LP model
-    model = pulp.LpProblem("Waste_Optimization_kg_input_ton", pulp.LpMinimize)
-    decision_vars = {}
-
-    # Decision variables & demand
-    for idx, row in user_df.iterrows():
-        item, category, qty_kg = row['Waste_Item'], row['Category'], row['Quantity_kg']
-        # Valid treatments for this item+cat
-        applicable = treatments_df[(treatments_df['Waste_Item']==item) & (treatments_df['Category']==category)]
-        for _, t in applicable.iterrows():
-            tr, em_fac, tr_cost = t['Treatment'], float(t['Emission_Factor']), float(t['Treatment_Cost'])
-            for fid, rules in facility_rules.items():
-                if category in rules['Category'] and tr in rules['Treatment']:
-                    fac = facility_df[(facility_df['Facility_ID']==fid) & (facility_df.get('Treatment',tr)==tr)]
-                    if fac.empty:
-                        continue
-                    coords = (float(fac['Latitude'].iloc[0]), float(fac['Longitude'].iloc[0]))
-                    var = pulp.LpVariable(f"x_{idx}_{tr}_{fid}", lowBound=0, upBound=qty_kg)
-                    decision_vars[(idx, item, category, tr, fid)] = {
-                        'var': var,
-                        'em_fac': em_fac,
-                        'tr_cost': tr_cost,
-                        'coords': coords
-                    }
-        # Demand constraint
-        model += (
-            pulp.lpSum(v['var'] for (i,_,_,_,_), v in decision_vars.items() if i==idx) == qty_kg,
-            f"Demand_{idx}"
-        )
-
-    # Max-proportion constraints
-    totals = user_df.groupby('Category')['Quantity_kg'].sum().to_dict()
-    for _, mp in max_prop_df.iterrows():
-        cat, trt, prop = mp['Category'], mp['Treatment'], float(mp['Max_Proportion'])
-        if cat not in totals:
-            continue
-        cap_kg = prop * totals[cat]
-        vars_for = [v['var'] for k,v in decision_vars.items() if k[2]==cat and k[3]==trt]
-        if vars_for:
-            model += (
-                pulp.lpSum(vars_for) <= cap_kg,
-                f"MaxProp_{cat.replace(' ','')}_{trt.replace(' ','')}"
-            )
-
-    # Facility capacity constraints
-    for fid in facility_df['Facility_ID'].unique():
-        cap_kg = float(facility_df.loc[facility_df['Facility_ID']==fid, 'Max_Capacity'].iloc[0])
-        terms = [v['var'] for k,v in decision_vars.items() if k[4]==fid]
-        if terms:
-            model += (
-                pulp.lpSum(terms) <= cap_kg,
-                f"Cap_{fid}"
-            )
-
-    # Objective: minimize emissions\    
-    obj_terms = []
-    for props in decision_vars.values():
-        var_kg = props['var']
-        em_treat = var_kg * props['em_fac']          # kgCO2
-        poss = transport_df[transport_df['Max_Capacity']>=var_kg]
-        if poss.empty:
-            poss = transport_df
-        best = poss.nsmallest(1, 'Emission_per_kg').iloc[0]
-        dist = geodesic(origin_coords, props['coords']).km
-        em_trans = var_kg * best['Emission_per_kg'] * dist
-        obj_terms.append(em_treat + em_trans)
-    model += pulp.lpSum(obj_terms), "Total_Emission"
-
-    # Budget constraint: treatment + transport cost
-    cost_terms = []
-    for props in decision_vars.values():
-        var_kg = props['var']
-        cost_tr = var_kg * props['tr_cost']
-        poss = transport_df[transport_df['Max_Capacity']>=var_kg]
-        if poss.empty:
-            poss = transport_df
-        best = poss.nsmallest(1, 'Cost_per_kg').iloc[0]
-        dist = geodesic(origin_coords, props['coords']).km
-        cost_trans = var_kg * best['Cost_per_kg'] * dist
-        cost_terms.append(cost_tr + cost_trans)
-    model += (
-        pulp.lpSum(cost_terms) <= max_budget,
-        "Budget_Constraint"
-    )
-
-    # Solve model
-    status_code = model.solve()
-    status = pulp.LpStatus.get(status_code, "Unknown")
-
-    # Collect results
-    results = []
-    for (idx, item, cat, tr, fid), props in decision_vars.items():
-        amt_kg = props['var'].varValue or 0
-        if amt_kg > 1e-6:
-            tpa = data.locations_df.loc[data.locations_df['Facility_ID']==fid, 'Location'].iloc[0]
-            poss = transport_df[transport_df['Max_Capacity']>=amt_kg]
-            if poss.empty:
-                poss = transport_df
-            best = poss.nsmallest(1, 'Emission_per_kg').iloc[0]
-            dist = geodesic(origin_coords, props['coords']).km
-            results.append({
-                'Waste_Item': item,
-                'Category': cat,
-                'Treatment': tr,
-                'TPA_Name': tpa,
-                'Distance_km': round(dist,2),
-                'Amount_kg': round(amt_kg, 3),
-                'Total_Emission_kgCO2': round(amt_kg * (props['em_fac'] + best['Emission_per_kg'] * dist), 3),
-                'Total_Cost_Rp': round(amt_kg * (props['tr_cost'] + best['Cost_per_kg'] * dist), 2)
-            })
-    df_out = pd.DataFrame(results)
-    return df_out, df_out['Total_Emission_kgCO2'].sum(), df_out['Total_Cost_Rp'].sum(), status
+import io
+import os
+import builder
+import distance
+import ingest
+import planning
+import session
+import solver as solvers
+import store
+import sweep
+
+# The solve lives in builder so batch runs need not import Streamlit; re-exported for existing callers
+optimize_waste = builder.optimize_waste
+
+
+@st.cache_resource
+def reference_store(path: str = None):
+    # Compiled reference data, shared by all sessions and reruns
+    return store.activate(path)
+
+@st.cache_data
+def load_upload(content: bytes, name: str):
+    # Parsed upload, reused across reruns until the file changes
+    buf = io.BytesIO(content)
+    buf.name = name
+    return ingest.read_input(buf)
 
 # Streamlit UI remains same but displays Amount_kg and updated fields
 
@@ -159,21 +39,135 @@ def main():
         "[Download Input Template](https://docs.google.com/spreadsheets/"
         "d/1_w-_bBK6BpI3i-WM6L8ZlSZphyOCx3yco_TBh1cCnH0/edit?usp=sharing)"
     )
-    uploaded = st.file_uploader("Choose Excel...", type=["xlsx","xls"])
-    max_budget = st.number_input("Max Budget (Rp)", min_value=0.0, step=1000.0)
+    uploaded = st.file_uploader("Choose Excel, CSV or Parquet...", type=["xlsx","xls","csv","parquet"])
+    sweep_mode = st.checkbox("Budget sweep (emission vs. cost Pareto front)")
+    if sweep_mode:
+        n_points = st.number_input("Budget points", min_value=2, max_value=200, value=20, step=1)
+        max_budget = 0.0
+    else:
+        max_budget = st.number_input("Max Budget (Rp)", min_value=0.0, step=1000.0)
     st.subheader("Origin Coordinates")
-    origin_lat = st.number_input("Latitude", value=float(data.locations_df['Latitude'].mean()))
-    origin_lon = st.number_input("Longitude", value=float(data.locations_df['Longitude'].mean()))
+    st.caption("Default origin for rows without Origin_Latitude/Origin_Longitude or Origin_ID; an Origin_ID "
+               "must be listed in an 'Origins' sheet or origins table (Origin_ID, Latitude, Longitude)")
+    ref = reference_store(os.environ.get(store.REFERENCE_ENV))
+    origin_lat = st.number_input("Latitude", value=float(ref.facility_lat.mean()))
+    origin_lon = st.number_input("Longitude", value=float(ref.facility_lon.mean()))
     origin_coords = (origin_lat, origin_lon)
+    origins_file = st.file_uploader("Origins table (optional)", type=["csv","xlsx","xls","parquet"])
+    road_file = st.file_uploader("Road distance matrix (optional)", type=["csv","xlsx","xls"])
+    road_matrix = distance.load_road_matrix(road_file) if road_file else None
+    with st.expander("Solver Settings"):
+        backend = st.selectbox("Solver", solvers.available_backends())
+        threads = st.number_input("Threads", min_value=1, value=1, step=1)
+        time_limit = st.number_input("Time limit (s, 0 = none)", min_value=0.0, value=0.0, step=10.0)
+
+    if uploaded and (max_budget>0 or sweep_mode):
+        try:
+            user_df, origins, skipped = load_upload(uploaded.getvalue(), uploaded.name)
+        except ValueError as exc:
+            st.error(str(exc))
+            return
+        try:
+            origins = ingest.merge_origins(origins, ingest.read_origins(origins_file) if origins_file else None)
+            resolved = builder.resolve_origins(user_df, origin_coords, origins)
+            if road_matrix:
+                # Every origin must be covered by the road distance matrix
+                builder.origin_distance_table(
+                    resolved[[c for c in builder.ORIGIN_COLUMNS if c in resolved.columns]].drop_duplicates(), road_matrix)
+        except ValueError as exc:
+            st.error(str(exc))
+            return
+        if len(skipped):
+            st.warning(f"{int(skipped['Rows'].sum())} rows with an unknown Waste_Item/Category or an invalid "
+                       "Quantity were skipped")
+            st.dataframe(skipped)
+        solver_opts = dict(backend=backend, threads=int(threads), time_limit=time_limit or None)
+        try:
+            solvers.make_solver(**solver_opts)
+        except ValueError as exc:
+            st.error(str(exc))
+            return
+        plan_mode = (not sweep_mode and planning.PERIOD in user_df.columns
+                     and st.checkbox("Multi-period plan (one model over all periods)"))
+        if sweep_mode and st.button("Run Budget Sweep"):
+            with st.spinner("Sweeping budgets..."):
+                res = sweep.sweep_budgets(
+                    user_df, n_points=int(n_points), origin_coords=origin_coords,
+                    solver=solvers.make_solver(**solver_opts),
+                    road_matrix=road_matrix, origins=origins)
+                front = sweep.pareto_front(res)
+            st.subheader("Pareto Front")
+            st.line_chart(front, x='Total_Cost_Rp', y='Total_Emission_kgCO2')
+            st.dataframe(res)
+            csv = res.to_csv(index=False).encode('utf-8')
+            st.download_button("Download Sweep", csv, "sweep.csv", "text/csv")
+        elif plan_mode:
+            st.caption("Facility capacities apply over the whole horizon; Max Budget is the horizon total")
+            period_budget = st.number_input("Budget per period (Rp, 0 = none)", min_value=0.0, step=1000.0)
+            carryover = st.checkbox("Carry unspent budget forward", disabled=not period_budget)
+            period_capacity = st.number_input("Capacity per period (% of capacity, 0 = none)",
+                                              min_value=0.0, max_value=100.0, value=0.0, step=1.0)
+            window = st.number_input("Rolling horizon window (periods, 0 = whole horizon)", min_value=0, value=0, step=1)
+            step = st.number_input("Periods committed per window", min_value=1, value=1, step=1, disabled=not window)
+            if st.button("Run Planning"):
+                with st.spinner("Planning..."):
+                    res, summary, status, telemetry = planning.optimize_horizon(
+                        user_df, max_budget, origin_coords, period_budget=period_budget or None,
+                        budget_carryover=carryover, period_capacity=period_capacity / 100.0 or None,
+                        window=int(window) or None, step=int(step), road_matrix=road_matrix, origins=origins,
+                        solver=solvers.make_solver(**solver_opts), log_path="solve_log.jsonl")
+                st.subheader(f"Status: {status}")
+                st.write(f"**Total Emission:** {res['Total_Emission_kgCO2'].sum():.2f} kg CO₂")
+                st.write(f"**Total Cost:** Rp {res['Total_Cost_Rp'].sum():,.2f}")
+                st.caption(
+                    f"{telemetry['solver']}: {telemetry['windows']} model(s), build {telemetry['build_s']:.2f} s, "
+                    f"solve {telemetry['solve_s']:.2f} s, {telemetry['variables']:,} variables, "
+                    f"{telemetry['constraints']:,} constraints"
+                )
+                st.dataframe(summary)
+                st.line_chart(summary, x=planning.PERIOD, y=['Total_Cost_Rp', 'Cumulative_Cost_Rp'])
+                st.dataframe(planning.facility_usage(res))
+                st.dataframe(res)
+                csv = res.to_csv(index=False).encode('utf-8')
+                st.download_button("Download Plan", csv, "plan.csv", "text/csv")
+        elif not sweep_mode:
+            # The built model lives in the session state; what-if edits change it in place and re-solve
+            run_key = (uploaded.name, uploaded.size, max_budget, origin_coords,
+                       origins_file.name if origins_file else None, road_file.name if road_file else None, tuple(solver_opts.items()), ref.digest)
+            if st.button("Run Optimization"):
+                with st.spinner("Optimizing..."):
+                    st.session_state['model_session'] = session.ModelSession(
+                        user_df, max_budget, origin_coords, road_matrix=road_matrix, origins=origins,
+                        solver=solvers.make_solver(**solver_opts))
+                    st.session_state['model_session_key'] = run_key
+            model_session = st.session_state.get('model_session')
+            if model_session is None or st.session_state.get('model_session_key') != run_key:
+                return
+
+            with st.expander("What-if Edits"):
+                closed = st.multiselect("Close facilities", list(ref.facility_ids),
+                                        format_func=lambda fid: f"{fid} - {ref.facility_names[ref.facility_ids.get_loc(fid)]}")
+                limits = st.data_editor(
+                    pd.DataFrame(ref.max_prop, columns=['Category', 'Treatment', 'Max_Proportion']),
+                    disabled=['Category', 'Treatment'], hide_index=True, key='what_if_max_prop')
+                capacities = st.data_editor(
+                    pd.DataFrame([(fid, cap / 1000.0) for fid, cap in ref.facility_caps],
+                                 columns=['Facility_ID', 'Capacity_t']),
+                    disabled=['Facility_ID'], hide_index=True, key='what_if_capacity')
+            model_session.set_closed(closed)
+            for cat, trt, prop in limits.itertuples(index=False):
+                model_session.set_max_proportion(cat, trt, prop)
+            for fid, cap_t in capacities.itertuples(index=False):
+                model_session.set_capacity(fid, cap_t)
+            res, tot_em, tot_ct, status, telemetry = model_session.solve(log_path="solve_log.jsonl")
 
-    if uploaded and max_budget>0:
-        user_df = pd.read_excel(uploaded, engine='openpyxl')
-        if st.button("Run Optimization"):
-            with st.spinner("Optimizing..."):
-                res, tot_em, tot_ct, status = optimize_waste(user_df, max_budget, origin_coords)
             st.subheader(f"Status: {status}")
             st.write(f"**Total Emission:** {tot_em:.2f} kg CO₂")
             st.write(f"**Total Cost:** Rp {tot_ct:,.2f}")
+            st.caption(
+                f"{telemetry['solver']}: build {telemetry['build_s']:.2f} s, solve {telemetry['solve_s']:.2f} s, "
+                f"{telemetry['variables']:,} variables, {telemetry['constraints']:,} constraints"
+            )
             st.dataframe(res)
             csv = res.to_csv(index=False).encode('utf-8')
             st.download_button("Download Results", csv, "results.csv", "text/csv")
@@ -0,0 +1,163 @@
+import argparse
+import glob
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+INPUT_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.csv', '.parquet')
+SUMMARY_COLUMNS = ['File', 'Status', 'Total_Emission_kgCO2', 'Total_Cost_Rp', 'Rows', 'Skipped_Rows', 'Allocations',
+                   'Build_s', 'Solve_s', 'Total_s', 'Output', 'Error']
+
+
+def find_inputs(patterns):
+    # Input files from directories and glob patterns, in a stable order
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        paths.extend(p for p in glob.glob(pattern)
+                     if os.path.splitext(p)[1].lower() in INPUT_EXTENSIONS and not os.path.basename(p).startswith('~$'))
+    return sorted(set(paths))
+
+
+def write_frame(df: pd.DataFrame, path: str, fmt: str):
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def output_paths(paths, out_dir: str, fmt: str = 'csv'):
+    # Result file per input, mirroring its path below the inputs' common directory; inputs that
+    # differ only by extension keep it in the name (site1.xlsx -> site1_xlsx_results.csv)
+    if not paths:
+        return []
+    full = [os.path.abspath(p) for p in paths]
+    root = os.path.commonpath([os.path.dirname(p) for p in full])
+    stems = [os.path.splitext(os.path.relpath(p, root))[0] for p in full]
+    counts = Counter(os.path.normcase(stem) for stem in stems)
+    return [
+        os.path.join(out_dir, f"{stem}_{os.path.splitext(p)[1].lstrip('.').lower()}_results.{fmt}"
+                     if counts[os.path.normcase(stem)] > 1 else f"{stem}_results.{fmt}")
+        for stem, p in zip(stems, full)
+    ]
+
+
+def run_file(path: str, max_budget: float, origin_coords: tuple, output: str, fmt: str = 'csv',
+             solver_opts: dict = None, road_matrix=None, log_path: str = None, origins: pd.DataFrame = None):
+    # Optimize one input file and write its allocation; returns its summary row
+    import builder
+    import ingest
+    import solver as solvers
+    start = time.perf_counter()
+    summary = {'File': path}
+    try:
+        user_df, origins, skipped = ingest.read_input(path, origins=origins)
+        res, tot_em, tot_ct, status, telemetry = builder.optimize_waste(
+            user_df, max_budget, origin_coords, road_matrix=road_matrix, origins=origins,
+            solver=solvers.make_solver(**(solver_opts or {})), log_path=log_path)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        write_frame(res, output, fmt)
+        summary.update({
+            'Status': status,
+            'Total_Emission_kgCO2': tot_em,
+            'Total_Cost_Rp': tot_ct,
+            'Rows': len(user_df),
+            'Skipped_Rows': int(skipped['Rows'].sum()),
+            'Allocations': len(res),
+            'Build_s': telemetry['build_s'],
+            'Solve_s': telemetry['solve_s'],
+            'Output': output,
+        })
+    except Exception as exc:
+        summary.update({'Status': 'Error', 'Error': f"{type(exc).__name__}: {exc}"})
+    summary['Total_s'] = round(time.perf_counter() - start, 4)
+    return summary
+
+
+def run_batch(paths, max_budget: float, origin_coords: tuple, out_dir: str, fmt: str = 'csv',
+              workers: int = None, solver_opts: dict = None, road_matrix=None, log_path: str = None,
+              origins: pd.DataFrame = None, progress=None):
+    # Optimize many input files on a process pool; each result is written as soon as its file
+    # finishes, so only the summary rows are held in memory. progress(done, total, row) is
+    # called as each file finishes
+    if fmt == 'parquet':
+        import pyarrow  # noqa: F401 - required by DataFrame.to_parquet
+    outputs = output_paths(paths, out_dir, fmt)
+    duplicates = sorted(o for o, n in Counter(os.path.normcase(o) for o in outputs).items() if n > 1)
+    if duplicates:
+        raise ValueError(f"Several inputs would write the same result file: {duplicates}")
+    os.makedirs(out_dir, exist_ok=True)
+    solver_opts = {'msg': False, 'threads': 1, **(solver_opts or {})}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths) or 1))
+    rows = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(run_file, path, max_budget, origin_coords, output, fmt, solver_opts, road_matrix, log_path,
+                        origins)
+            for path, output in zip(paths, outputs)
+        ]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            if progress is not None:
+                progress(len(rows), len(paths), rows[-1])
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values('File').reset_index(drop=True)
+    write_frame(summary, os.path.join(out_dir, f"summary.{fmt}"), fmt)
+    return summary
+
+
+def main(argv=None):
+    import distance
+    import ingest
+    import solver as solvers
+    import store
+    parser = argparse.ArgumentParser(description="Optimize waste allocation for many input files")
+    parser.add_argument('inputs', nargs='+', help="Excel/CSV/Parquet files, directories or glob patterns")
+    parser.add_argument('--budget', type=float, required=True, help="max budget (Rp) per file")
+    parser.add_argument('--lat', type=float, help="default origin latitude (default: facility mean)")
+    parser.add_argument('--lon', type=float, help="default origin longitude (default: facility mean)")
+    parser.add_argument('--road-matrix', help="road distance matrix (CSV/Excel)")
+    parser.add_argument('--origins', help="origins table (Origin_ID, Latitude, Longitude) for inputs' Origin_IDs")
+    parser.add_argument('--out', default='batch_output', help="output directory")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--workers', type=int, help="processes (default: all cores)")
+    parser.add_argument('--backend', default='cbc', help="solver backend (cbc, highs, glpk)")
+    parser.add_argument('--threads', type=int, default=1, help="solver threads per file")
+    parser.add_argument('--time-limit', type=float, help="solver time limit per file (s)")
+    parser.add_argument('--log', help="append per-solve telemetry to this JSON-lines file")
+    parser.add_argument('--reference', help=f"versioned reference data file (default: ${store.REFERENCE_ENV} or data.py)")
+    args = parser.parse_args(argv)
+    if args.reference:
+        # Worker processes compile the store from the environment at import
+        os.environ[store.REFERENCE_ENV] = args.reference
+        store.activate(args.reference)
+    ref = store.get_store()
+    origin_coords = (args.lat if args.lat is not None else float(ref.facility_lat.mean()),
+                     args.lon if args.lon is not None else float(ref.facility_lon.mean()))
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        parser.error("no input files found")
+    road_matrix = distance.load_road_matrix(args.road_matrix) if args.road_matrix else None
+    origins = ingest.read_origins(args.origins) if args.origins else None
+    solver_opts = {'backend': args.backend, 'threads': args.threads, 'time_limit': args.time_limit}
+    try:
+        solvers.make_solver(**solver_opts)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    def progress(done, total, row):
+        print(f"[{done}/{total}] {row['File']}: {row['Status']}", flush=True)
+
+    try:
+        summary = run_batch(paths, args.budget, origin_coords, args.out, args.format,
+                            args.workers, solver_opts, road_matrix, args.log, origins, progress)
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(summary[['File', 'Status', 'Total_Emission_kgCO2', 'Total_Cost_Rp', 'Total_s']].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import builder
+import data
+import store
+
+
+def synthetic_input(n_rows: int, seed: int = 0):
+    # Random user sheet drawn from the known (Waste_Item, Category) pairs, quantities in tons
+    rng = np.random.default_rng(seed)
+    pairs = data.treatments_df[['Waste_Item', 'Category']].drop_duplicates().reset_index(drop=True)
+    user_df = pairs.iloc[rng.integers(0, len(pairs), n_rows)].reset_index(drop=True)
+    user_df['Quantity'] = rng.uniform(0.1, 20.0, n_rows).round(3)
+    return user_df
+
+
+def bench_build(sizes, max_budget: float, origin_coords: tuple, aggregate: bool = False):
+    rows = []
+    for n in sizes:
+        user_df = synthetic_input(n)
+        start = time.perf_counter()
+        if aggregate:
+            user_df, _, _ = builder.aggregate_rows(user_df)
+        model, index = builder.build_model(user_df, max_budget, origin_coords)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            'Rows': n,
+            'Variables': len(index['vars']),
+            'Constraints': len(model.constraints),
+            'Build_s': round(elapsed, 3),
+            'us_per_row': round(elapsed / n * 1e6, 1),
+        })
+        print(rows[-1], flush=True)
+    return pd.DataFrame(rows)
+
+
+def bench_sweep(n_rows: int, n_points: int, origin_coords: tuple, workers: int = None):
+    # One build + RHS-only re-solves vs. independent optimize_waste runs at the same budgets
+    import sweep
+    user_df = synthetic_input(n_rows)
+    user_df = user_df[user_df['Waste_Item'].isin(['Paper', 'Cardboard', 'Plastic', 'Glass', 'Household Waste', 'Wood'])]
+    start = time.perf_counter()
+    res = sweep.sweep_budgets(user_df, n_points=n_points, origin_coords=origin_coords, workers=workers)
+    sweep_s = time.perf_counter() - start
+    # Independent runs as optimize_waste does them by default (aggregated), and per row
+    independent_s = {}
+    for aggregate in (True, False):
+        start = time.perf_counter()
+        for budget in res['Budget_Rp']:
+            builder.optimize_waste(user_df, budget, origin_coords, aggregate=aggregate)
+        independent_s[aggregate] = time.perf_counter() - start
+    return pd.DataFrame([{'Rows': len(user_df), 'Points': n_points, 'Sweep_s': round(sweep_s, 3),
+                          'Independent_s': round(independent_s[True], 3),
+                          'Independent_per_row_s': round(independent_s[False], 3)}])
+
+
+def bench_solvers(sizes, backends, max_budget: float, origin_coords: tuple, threads: int = None):
+    # Same synthetic per-row models solved by each installed backend
+    import solver as solvers
+    available = solvers.available_backends()
+    rows = []
+    for n in sizes:
+        user_df = synthetic_input(n)
+        user_df = user_df[user_df['Waste_Item'].isin(['Paper', 'Cardboard', 'Plastic', 'Glass', 'Household Waste', 'Wood'])]
+        for backend in backends:
+            if backend not in available:
+                print(f"skipping {backend}: not installed", flush=True)
+                continue
+            start = time.perf_counter()
+            model, _ = builder.build_model(user_df, max_budget, origin_coords)
+            build_s = time.perf_counter() - start
+            _, telemetry = solvers.solve(model, solvers.make_solver(backend, threads=threads), build_s)
+            rows.append({'Rows': len(user_df), 'Backend': backend, **telemetry})
+            print(rows[-1], flush=True)
+    return pd.DataFrame(rows)
+
+
+def bench_ingest(n_rows: int, fmt: str = 'csv'):
+    # Load time and peak traced memory: plain pandas read vs. chunked compact ingestion
+    import os
+    import tempfile
+    import tracemalloc
+    import ingest
+    user_df = synthetic_input(n_rows)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"input.{fmt}")
+        if fmt == 'xlsx':
+            user_df.to_excel(path, index=False)
+            plain = lambda: pd.read_excel(path, engine='openpyxl')
+        else:
+            user_df.to_csv(path, index=False)
+            plain = lambda: pd.read_csv(path)
+        for name, load in (('pandas', plain), ('ingest', lambda: ingest.read_input(path)[0])):
+            start = time.perf_counter()
+            df = load()
+            elapsed = time.perf_counter() - start
+            del df
+            tracemalloc.start()
+            df = load()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append({'Rows': n_rows, 'Format': fmt, 'Reader': name, 'Load_s': round(elapsed, 3),
+                         'Peak_MB': round(peak / 2**20, 1),
+                         'Frame_MB': round(df.memory_usage(deep=True).sum() / 2**20, 1)})
+            del df
+    return pd.DataFrame(rows)
+
+
+def bench_horizon(n_rows: int, n_periods: int, origin_coords: tuple, window: int = 3):
+    # One multi-period model vs. a rolling horizon vs. independent optimize_waste runs per period
+    # (which cannot share capacity, so each may use a facility's full capacity)
+    import planning
+    user_df = pd.concat([synthetic_input(n_rows, seed=p).assign(Period=p + 1) for p in range(n_periods)],
+                        ignore_index=True)
+    user_df = user_df[user_df['Waste_Item'].isin(['Paper', 'Cardboard', 'Plastic', 'Glass', 'Household Waste', 'Wood'])]
+    rows = []
+    for name, kwargs in (('horizon', {}), (f'rolling_{window}', {'window': window})):
+        start = time.perf_counter()
+        res, _, status, telemetry = planning.optimize_horizon(user_df, origin_coords=origin_coords, **kwargs)
+        rows.append({'Rows': len(user_df), 'Periods': n_periods, 'Method': name, 'Status': status,
+                     'Models': telemetry['windows'], 'Total_s': round(time.perf_counter() - start, 3),
+                     'Total_Emission_kgCO2': res['Total_Emission_kgCO2'].sum()})
+        print(rows[-1], flush=True)
+    start = time.perf_counter()
+    emission = 0.0
+    for _, period_df in user_df.groupby('Period'):
+        emission += builder.optimize_waste(period_df.drop(columns='Period'), 1e15, origin_coords)[1]
+    rows.append({'Rows': len(user_df), 'Periods': n_periods, 'Method': 'independent', 'Status': None,
+                 'Models': n_periods, 'Total_s': round(time.perf_counter() - start, 3),
+                 'Total_Emission_kgCO2': emission})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model build-time scaling benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--budget', type=float, default=1e12)
+    parser.add_argument('--aggregate', action='store_true', help="collapse identical rows before building")
+    parser.add_argument('--sweep', type=int, metavar='POINTS', help="compare a budget sweep with independent runs")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--backends', nargs='+', help="compare solver backends (cbc, highs, glpk)")
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--ingest', choices=['csv', 'xlsx'], help="compare input readers on this format")
+    parser.add_argument('--horizon', type=int, metavar='PERIODS', help="compare multi-period planning methods")
+    parser.add_argument('--window', type=int, default=3, help="rolling horizon window for --horizon")
+    args = parser.parse_args()
+    ref = store.get_store()
+    origin_coords = (float(ref.facility_lat.mean()), float(ref.facility_lon.mean()))
+    if args.horizon:
+        for n in args.sizes:
+            print(bench_horizon(n, args.horizon, origin_coords, args.window).to_string(index=False))
+        return
+    if args.ingest:
+        print(pd.concat([bench_ingest(n, args.ingest) for n in args.sizes]).to_string(index=False))
+        return
+    if args.backends:
+        print(bench_solvers(args.sizes, args.backends, args.budget, origin_coords, args.threads).to_string(index=False))
+        return
+    if args.sweep:
+        for n in args.sizes:
+            print(bench_sweep(n, args.sweep, origin_coords, args.workers).to_string(index=False))
+        return
+    print(bench_build(args.sizes, args.budget, origin_coords, args.aggregate).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import time
+import numpy as np
+import pandas as pd
+import pulp
+import distance
+import solver as solvers
+import store
+
+# Per-row origin columns of the input sheet (coordinates, or an ID resolved via an origins table)
+ORIGIN_COLUMNS = ('Origin_ID', 'Origin_Latitude', 'Origin_Longitude')
+
+# Rows sharing these columns are interchangeable in the LP
+AGGREGATE_KEYS = ('Waste_Item', 'Category') + ORIGIN_COLUMNS
+
+# Optional planning-period column of the input sheet (see planning.py)
+PERIOD_COLUMN = 'Period'
+
+# Position in the store's modes of each row's transport mode, sized by the row's own shipment
+MODE_COLUMN = 'Mode_Pos'
+
+
+def best_mode(loads_kg):
+    # Position in the store's modes of the lowest-emission mode whose Max_Capacity fits each load;
+    # loads above every capacity take several trips with the lowest-emission mode overall
+    ref = store.get_store()
+    return ref.mode_best[np.searchsorted(ref.mode_caps, np.asarray(loads_kg, dtype=float), side='left')]
+
+
+def resolve_origins(user_df: pd.DataFrame, origin_coords=None, origins=None):
+    # Fill per-row Origin_Latitude/Origin_Longitude from Origin_ID (via the origins table with
+    # Origin_ID, Latitude, Longitude); only rows without any origin take the default
+    # origin_coords, an Origin_ID with no coordinates is an error; idempotent
+    user_df = user_df.copy()
+    for col in ('Origin_Latitude', 'Origin_Longitude'):
+        if col not in user_df.columns:
+            user_df[col] = np.nan
+        user_df[col] = user_df[col].astype(float)
+    has_id = user_df['Origin_ID'].notna() if 'Origin_ID' in user_df.columns else pd.Series(False, index=user_df.index)
+    if origins is not None and has_id.any():
+        lookup = origins.drop_duplicates('Origin_ID').set_index('Origin_ID')
+        user_df['Origin_Latitude'] = user_df['Origin_Latitude'].fillna(user_df['Origin_ID'].map(lookup['Latitude']).astype(float))
+        user_df['Origin_Longitude'] = user_df['Origin_Longitude'].fillna(user_df['Origin_ID'].map(lookup['Longitude']).astype(float))
+    missing = has_id & (user_df['Origin_Latitude'].isna() | user_df['Origin_Longitude'].isna())
+    if missing.any():
+        ids = sorted(user_df.loc[missing, 'Origin_ID'].astype(str).unique())
+        raise ValueError(f"{int(missing.sum())} rows have an Origin_ID with no coordinates "
+                         f"(add it to the origins table): {', '.join(ids)}")
+    if origin_coords is not None:
+        no_origin = ~has_id
+        user_df.loc[no_origin, 'Origin_Latitude'] = user_df.loc[no_origin, 'Origin_Latitude'].fillna(float(origin_coords[0]))
+        user_df.loc[no_origin, 'Origin_Longitude'] = user_df.loc[no_origin, 'Origin_Longitude'].fillna(float(origin_coords[1]))
+    unresolved = user_df['Origin_Latitude'].isna() | user_df['Origin_Longitude'].isna()
+    if unresolved.any():
+        raise ValueError(f"{int(unresolved.sum())} rows have no origin coordinates")
+    return user_df
+
+
+def origin_distance_table(origin_df: pd.DataFrame, road_matrix=None):
+    # Origin x facility km (facilities in store order), one cached lookup per origin
+    origin_ids = origin_df['Origin_ID'] if 'Origin_ID' in origin_df.columns else [None] * len(origin_df)
+    fids = store.get_store().facility_ids
+    if road_matrix and len(origin_df) > 1:
+        # A matrix without an origin column holds one origin's distances, not every origin's
+        generic = sum(distance.road_key(road_matrix, (lat, lon), origin_id) is None
+                      for origin_id, lat, lon in zip(origin_ids, origin_df['Origin_Latitude'], origin_df['Origin_Longitude']))
+        if generic:
+            raise ValueError(f"Road distance matrix has no Origin_ID or origin coordinate column, but the input "
+                             f"has {len(origin_df)} origins")
+    return np.vstack([
+        distance.facility_distances((lat, lon), road_matrix, origin_id).reindex(fids).to_numpy(dtype=float)
+        for origin_id, lat, lon in zip(origin_ids, origin_df['Origin_Latitude'], origin_df['Origin_Longitude'])
+    ]).reshape(len(origin_df), len(fids))
+
+
+def aggregate_rows(user_df: pd.DataFrame, keys=AGGREGATE_KEYS):
+    # Collapse interchangeable rows into one commodity per key with the summed quantity;
+    # returns the commodity table, each row's commodity code and its share of that commodity
+    user_df = user_df.copy()
+    if 'Quantity' not in user_df.columns:
+        user_df['Quantity'] = 1.0
+    user_df['Quantity'] = user_df['Quantity'].astype(float)
+    # Rows are only interchangeable if they also travel by the same mode
+    if MODE_COLUMN not in user_df.columns:
+        user_df[MODE_COLUMN] = best_mode(user_df['Quantity'].to_numpy() * 1000.0)
+    keys = [k for k in keys if k in user_df.columns] + [MODE_COLUMN]
+    groups = user_df.groupby(keys, sort=False, dropna=False, observed=True)
+    codes = groups.ngroup().to_numpy()
+    commodities = groups['Quantity'].sum().reset_index()
+    qty = user_df['Quantity'].to_numpy(dtype=float)
+    totals = commodities['Quantity'].to_numpy(dtype=float)[codes]
+    shares = np.divide(qty, totals, out=np.zeros_like(qty), where=totals != 0)
+    return commodities, codes, shares
+
+
+def build_arcs(user_df: pd.DataFrame, origin_coords: tuple, road_matrix=None, origins=None):
+    # Every user row expanded into its feasible (treatment, facility) arcs with emission and cost
+    # coefficients; returns (user_df with origins resolved, arcs, origin columns, multi-origin flag)
+    if not len(user_df):
+        raise ValueError("No rows to optimize")
+    user_df = resolve_origins(user_df, origin_coords, origins)
+    if 'Quantity' not in user_df.columns:
+        user_df['Quantity'] = 1.0
+    # Quantity in tons -> kg
+    user_df['Quantity_kg'] = user_df['Quantity'].astype(float) * 1000.0
+    # One row is one shipment; aggregated commodities keep the mode of the rows they merge
+    if MODE_COLUMN not in user_df.columns:
+        user_df[MODE_COLUMN] = best_mode(user_df['Quantity_kg'].to_numpy())
+
+    ref = store.get_store()
+
+    # Distinct origins and their distance to every facility
+    origin_cols = [c for c in ORIGIN_COLUMNS if c in user_df.columns]
+    origin_groups = user_df.groupby(origin_cols, sort=False, dropna=False, observed=True)
+    origin_df = origin_groups.head(1)[origin_cols].reset_index(drop=True)
+    dist_table = origin_distance_table(origin_df, road_matrix)
+    multi_origin = 'Origin_ID' in origin_cols or len(origin_df) > 1
+
+    # Expand every user row into its feasible arcs with a single join
+    rows = pd.DataFrame({
+        'Row': np.arange(len(user_df)),
+        'Idx': user_df.index,
+        'Origin': origin_groups.ngroup().to_numpy(),
+        'Waste_Item': user_df['Waste_Item'].to_numpy(),
+        'Category': user_df['Category'].to_numpy(),
+        'Quantity_kg': user_df['Quantity_kg'].to_numpy(dtype=float),
+        MODE_COLUMN: user_df[MODE_COLUMN].to_numpy(),
+    })
+    for col in origin_cols + [c for c in (PERIOD_COLUMN,) if c in user_df.columns]:
+        rows[col] = user_df[col].to_numpy()
+    arc_table = ref.arcs.reset_index().rename(columns={'index': 'Arc'})
+    arcs = (
+        rows.merge(arc_table, on=['Waste_Item', 'Category'])
+        .sort_values(['Row', 'Arc'], kind='stable')
+        .reset_index(drop=True)
+    )
+
+    # Per-variable coefficients
+    arcs['Distance_km'] = dist_table[arcs['Origin'].to_numpy(), ref.facility_ids.get_indexer(arcs['Facility_ID'])]
+    # Transport mode per arc, that of its row, looked up from precomputed arrays
+    mode = arcs[MODE_COLUMN].to_numpy()
+    arcs['Mode'] = ref.modes['Mode'].to_numpy()[mode]
+    arcs['Mode_Emission_per_kg'] = ref.modes['Emission_per_kg'].to_numpy()[mode]
+    arcs['Mode_Cost_per_kg'] = ref.modes['Cost_per_kg'].to_numpy()[mode]
+    arcs['Emission_Coef'] = arcs['Emission_Factor'] + arcs['Mode_Emission_per_kg'] * arcs['Distance_km']
+    arcs['Cost_Coef'] = arcs['Treatment_Cost'] + arcs['Mode_Cost_per_kg'] * arcs['Distance_km']
+
+    return user_df, arcs, origin_cols, multi_origin
+
+
+def build_model(user_df: pd.DataFrame, max_budget: float, origin_coords: tuple, road_matrix=None, origins=None):
+    user_df, arcs, origin_cols, multi_origin = build_arcs(user_df, origin_coords, road_matrix, origins)
+    ref = store.get_store()
+
+    model = pulp.LpProblem("Waste_Optimization_kg_input_ton", pulp.LpMinimize)
+    names = ("x_" + arcs['Idx'].astype(str) + "_" + arcs['Treatment'] + "_" + arcs['Facility_ID']).tolist()
+    x = [pulp.LpVariable(n, lowBound=0, upBound=ub) for n, ub in zip(names, arcs['Quantity_kg'].tolist())]
+
+    # Index lists so each constraint is assembled from its own variables only
+    by_row = arcs.groupby('Row', sort=True).indices
+    by_cat_trt = arcs.groupby(['Category', 'Treatment'], sort=False).indices
+    by_facility = arcs.groupby('Facility_ID', sort=False).indices
+
+    # Demand constraints (rows with no feasible arc keep an empty, infeasible demand)
+    empty = np.empty(0, dtype=int)
+    for r, (idx, qty_kg) in enumerate(zip(user_df.index.tolist(), user_df['Quantity_kg'].tolist())):
+        expr = pulp.LpAffineExpression([(x[i], 1) for i in by_row.get(r, empty)])
+        model += (expr == qty_kg, f"Demand_{idx}")
+
+    # Max-proportion constraints
+    totals = user_df.groupby('Category', observed=True)['Quantity_kg'].sum().to_dict()
+    max_prop_constraints = {}
+    for cat, trt, prop in ref.max_prop:
+        if cat not in totals:
+            continue
+        members = by_cat_trt.get((cat, trt))
+        if members is not None and len(members):
+            expr = pulp.LpAffineExpression([(x[i], 1) for i in members])
+            constraint = expr <= prop * totals[cat]
+            model += (constraint, f"MaxProp_{cat.replace(' ','')}_{trt.replace(' ','')}")
+            max_prop_constraints[(cat, trt)] = constraint
+
+    # Facility capacity constraints
+    cap_constraints = {}
+    for fid, cap_kg in ref.facility_caps:
+        members = by_facility.get(fid)
+        if members is not None and len(members):
+            expr = pulp.LpAffineExpression([(x[i], 1) for i in members])
+            constraint = expr <= cap_kg
+            model += (constraint, f"Cap_{fid}")
+            cap_constraints[fid] = constraint
+
+    # Objective: minimize emissions (treatment + transport)
+    model += pulp.LpAffineExpression(zip(x, arcs['Emission_Coef'].tolist())), "Total_Emission"
+
+    # Budget constraint: treatment + transport cost
+    model += (
+        pulp.LpAffineExpression(zip(x, arcs['Cost_Coef'].tolist())) <= max_budget,
+        "Budget_Constraint"
+    )
+
+    index = {
+        'arcs': arcs,
+        'vars': x,
+        'by_row': by_row,
+        'by_cat_trt': by_cat_trt,
+        'by_facility': by_facility,
+        'totals': totals,
+        'max_prop_constraints': max_prop_constraints,
+        'cap_constraints': cap_constraints,
+        'origin_columns': origin_cols if multi_origin else [],
+    }
+    return model, index
+
+
+def disaggregate(index, amounts, codes, shares):
+    # Split commodity allocations back across the original rows, in row then arc order
+    rows = index['arcs']['Row'].to_numpy()
+    counts = np.bincount(rows, minlength=int(codes.max()) + 1 if len(codes) else 0)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    n_arcs = counts[codes]
+    ends = np.cumsum(n_arcs)
+    arc_ids = np.repeat(offsets[codes], n_arcs) + np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - n_arcs, n_arcs)
+    return arc_ids, amounts[arc_ids] * np.repeat(shares, n_arcs)
+
+
+def collect_results(index, codes=None, shares=None):
+    # Row-level allocation table from a solved model
+    arcs = index['arcs']
+    amounts = np.array([v.varValue or 0 for v in index['vars']], dtype=float)
+    if codes is not None:
+        arc_ids, amounts = disaggregate(index, amounts, codes, shares)
+        arcs = arcs.iloc[arc_ids]
+    keep = amounts > 1e-6
+    alloc = arcs.loc[keep].reset_index(drop=True)
+    amt_kg = amounts[keep]
+    dist = alloc['Distance_km'].to_numpy()
+    origin_cols = [c for c in (PERIOD_COLUMN,) if c in alloc.columns] + index.get('origin_columns', [])
+    return pd.DataFrame({
+        **{col: alloc[col] for col in origin_cols},
+        'Waste_Item': alloc['Waste_Item'],
+        'Category': alloc['Category'],
+        'Treatment': alloc['Treatment'],
+        'TPA_Name': alloc['Location'],
+        'Transport_Mode': alloc['Mode'],
+        'Distance_km': np.round(dist, 2),
+        'Amount_kg': np.round(amt_kg, 3),
+        'Total_Emission_kgCO2': np.round(amt_kg * (alloc['Emission_Factor'].to_numpy() + alloc['Mode_Emission_per_kg'].to_numpy() * dist), 3),
+        'Total_Cost_Rp': np.round(amt_kg * (alloc['Treatment_Cost'].to_numpy() + alloc['Mode_Cost_per_kg'].to_numpy() * dist), 2),
+    }, columns=origin_cols + ['Waste_Item', 'Category', 'Treatment', 'TPA_Name', 'Transport_Mode', 'Distance_km',
+                'Amount_kg', 'Total_Emission_kgCO2', 'Total_Cost_Rp'])
+
+
+def optimize_waste(user_df: pd.DataFrame, max_budget: float, origin_coords: tuple = None, aggregate: bool = True,
+                   road_matrix=None, origins: pd.DataFrame = None, solver=None, log_path: str = None):
+    start = time.perf_counter()
+    # Per-row origins (Origin_Latitude/Origin_Longitude or Origin_ID), defaulting to origin_coords
+    user_df = resolve_origins(user_df, origin_coords, origins)
+
+    # Identical Waste_Item/Category/origin rows are interchangeable: solve one commodity per group
+    codes = shares = None
+    if aggregate:
+        user_df, codes, shares = aggregate_rows(user_df)
+
+    # Build LP model from the precomputed arc table (input in tons, model in kg)
+    model, index = build_model(user_df, max_budget, origin_coords, road_matrix, origins)
+
+    # Solve model (default PuLP solver unless a configured one is given)
+    status, telemetry = solvers.solve(model, solver, build_s=time.perf_counter() - start)
+    if log_path:
+        solvers.log_telemetry(telemetry, log_path, rows=len(codes) if codes is not None else len(user_df),
+                              max_budget=max_budget)
+
+    # Collect results at the original row level
+    df_out = collect_results(index, codes, shares)
+    return df_out, df_out['Total_Emission_kgCO2'].sum(), df_out['Total_Cost_Rp'].sum(), status, telemetry
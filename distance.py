@@ -0,0 +1,131 @@
+import functools
+import os
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+import store
+
+# WGS-84 ellipsoid (km), the same model geopy's geodesic uses
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Great-circle distance on a sphere, vectorized over NumPy arrays
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2, max_iter: int = 200, tol: float = 1e-12):
+    # Vincenty inverse formula on WGS-84, vectorized over NumPy arrays;
+    # pairs that do not converge (near-antipodal) fall back to geopy
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (lat1, lon1, lat2, lon2)))
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    L = np.radians(lon2 - lon1)
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < tol
+            if converged.all():
+                break
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    dist = WGS84_B * A * (sigma - delta_sigma)
+
+    for i in zip(*np.nonzero(~converged | ~np.isfinite(dist))):
+        dist[i] = geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).km
+    return dist
+
+
+DISTANCE_METHODS = {'vincenty': vincenty_km, 'haversine': haversine_km}
+
+
+def origin_distances(origin_coords: tuple, method: str = 'vincenty'):
+    # Great-circle km from one origin to every facility of the active reference store, computed
+    # once per origin; the module-level cache outlives Streamlit reruns and optimize_waste calls.
+    # The returned Series is shared between callers and must not be modified.
+    return _origin_distances(origin_coords, method, store.get_store().digest)
+
+
+@functools.lru_cache(maxsize=1024)
+def _origin_distances(origin_coords: tuple, method: str, digest: str):
+    ref = store.get_store()
+    lat, lon = origin_coords
+    km = DISTANCE_METHODS[method](lat, lon, ref.facility_lat, ref.facility_lon)
+    return pd.Series(km, index=ref.facility_ids, name='Distance_km')
+
+
+def load_road_matrix(source):
+    # Road distances from a CSV/Excel file with Facility_ID and Distance_km columns, optionally
+    # keyed by Origin_ID or Origin_Latitude/Origin_Longitude;
+    # returns {Origin_ID or (lat, lon) or None: {Facility_ID: km}}
+    name = str(getattr(source, 'name', source)).lower()
+    if os.path.splitext(name)[1] in ('.xlsx', '.xls'):
+        df = pd.read_excel(source, engine='openpyxl')
+    else:
+        df = pd.read_csv(source)
+    missing = {'Facility_ID', 'Distance_km'} - set(df.columns)
+    if missing:
+        raise ValueError(f"Road distance matrix is missing columns: {sorted(missing)}")
+
+    # IDs as stripped strings, the way ingestion reads Origin_ID and merge_origins normalizes it
+    if 'Origin_ID' in df.columns:
+        keys = [str(k).strip() for k in df['Origin_ID']]
+    elif {'Origin_Latitude', 'Origin_Longitude'} <= set(df.columns):
+        keys = list(zip(df['Origin_Latitude'].astype(float), df['Origin_Longitude'].astype(float)))
+    else:
+        keys = [None] * len(df)
+    matrix = {}
+    for key, fid, km in zip(keys, df['Facility_ID'], df['Distance_km'].astype(float)):
+        matrix.setdefault(key, {})[str(fid).strip()] = km
+    return matrix
+
+
+def road_key(road_matrix: dict, origin_coords: tuple, origin_id=None):
+    # Key of an origin's road distances: its Origin_ID, else its coordinates, else None for a
+    # matrix without an origin column; an origin the matrix does not cover is an error
+    if origin_id is not None and not pd.isna(origin_id) and str(origin_id).strip() in road_matrix:
+        return str(origin_id).strip()
+    origin_coords = (float(origin_coords[0]), float(origin_coords[1]))
+    if origin_coords in road_matrix:
+        return origin_coords
+    if None in road_matrix:
+        return None
+    origin = origin_id if origin_id is not None and not pd.isna(origin_id) else origin_coords
+    raise ValueError(f"Road distance matrix has no entries for origin {origin}")
+
+
+def facility_distances(origin_coords: tuple, road_matrix=None, origin_id=None, method: str = 'vincenty'):
+    # km from origin to each facility: cached great-circle, overridden by road distances where given
+    origin_coords = (float(origin_coords[0]), float(origin_coords[1]))
+    dist = origin_distances(origin_coords, method)
+    if road_matrix:
+        road = road_matrix[road_key(road_matrix, origin_coords, origin_id)]
+        if road:
+            dist = dist.copy()
+            known = dist.index.intersection(list(road))
+            dist[known] = [road[fid] for fid in known]
+    return dist
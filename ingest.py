@@ -0,0 +1,185 @@
+import os
+import numpy as np
+import pandas as pd
+import store
+
+REQUIRED_COLUMNS = ['Waste_Item', 'Category']
+OPTIONAL_COLUMNS = ['Quantity', 'Origin_ID', 'Origin_Latitude', 'Origin_Longitude', 'Period']
+INPUT_COLUMNS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+ORIGIN_TABLE_COLUMNS = ['Origin_ID', 'Latitude', 'Longitude']
+REPORT_COLUMNS = ['Waste_Item', 'Category', 'Issue', 'Rows']
+
+# Reasons a row is skipped, by issue code (0 = valid row)
+ISSUES = np.array(['', 'Unknown Waste_Item/Category', 'Missing Quantity', 'Invalid Quantity', 'Negative Quantity'],
+                  dtype=object)
+
+
+def _file_type(source):
+    name = str(getattr(source, 'name', source)).lower()
+    ext = os.path.splitext(name)[1]
+    if ext in ('.xlsx', '.xlsm', '.xls'):
+        return 'excel'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def _excel_chunks(source, chunksize: int):
+    # Rows of the first sheet in openpyxl read-only mode, plus the small 'Origins' sheet if any
+    import openpyxl
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        origins = None
+        if 'Origins' in wb.sheetnames:
+            rows = wb['Origins'].iter_rows(values_only=True)
+            header = next(rows, ())
+            origins = pd.DataFrame(list(rows), columns=header)
+        sheet = next(ws for ws in wb.worksheets if ws.title != 'Origins')
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+        keep = [i for i, h in enumerate(header) if h in INPUT_COLUMNS]
+        columns = [header[i] for i in keep]
+        chunk = []
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            chunk.append([row[i] if i < len(row) else None for i in keep])
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk, columns=columns), origins
+                chunk = []
+        yield pd.DataFrame(chunk, columns=columns), origins
+    finally:
+        wb.close()
+
+
+def _csv_chunks(source, chunksize: int):
+    for chunk in pd.read_csv(source, chunksize=chunksize, usecols=lambda c: c.strip() in INPUT_COLUMNS,
+                             dtype={'Waste_Item': 'category', 'Category': 'category', 'Origin_ID': str}):
+        yield chunk.rename(columns=str.strip), None
+
+
+def _parquet_chunks(source, chunksize: int):
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(source)
+    columns = [c for c in pf.schema_arrow.names if c in INPUT_COLUMNS]
+    for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas(), None
+
+
+def read_origins(source):
+    # Origins table (Origin_ID, Latitude, Longitude) from a CSV, Excel or Parquet file
+    kind = _file_type(source)
+    if kind == 'excel':
+        sheets = pd.read_excel(source, sheet_name=None)
+        origins = sheets.get('Origins', next(iter(sheets.values())))
+    elif kind == 'parquet':
+        origins = pd.read_parquet(source)
+    else:
+        origins = pd.read_csv(source)
+    origins = origins.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in ORIGIN_TABLE_COLUMNS if c not in origins.columns]
+    if missing:
+        raise ValueError(f"Origins table is missing columns: {missing}")
+    return origins[ORIGIN_TABLE_COLUMNS]
+
+
+def merge_origins(*tables):
+    # One origins table from several; earlier tables win for an Origin_ID listed twice
+    tables = [t for t in tables if t is not None and 'Origin_ID' in t.columns]
+    if not tables:
+        return None
+    origins = pd.concat(tables, ignore_index=True)
+    origins['Origin_ID'] = origins['Origin_ID'].astype(str).str.strip()
+    return origins.drop_duplicates('Origin_ID').reset_index(drop=True)
+
+
+def _encode(values: pd.Series, dtype: pd.CategoricalDtype):
+    # Integer codes into dtype (-1 if unknown) and the cleaned labels, stripping each distinct value once
+    raw_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    labels = pd.Index([str(u).strip() for u in uniques], dtype=object)
+    return dtype.categories.get_indexer(labels)[raw_codes], raw_codes, labels
+
+
+def _quantities(values: pd.Series):
+    # Quantities as float64 (NaN where unusable) and the issue code of each (0 if fine)
+    qty = pd.to_numeric(values, errors='coerce').to_numpy(np.float64)
+    missing = values.isna().to_numpy()
+    if not pd.api.types.is_numeric_dtype(values):
+        missing = missing | values.astype(str).str.strip().eq('').to_numpy()
+    issue = np.select([missing, np.isnan(qty), qty < 0], [2, 3, 4], 0).astype(np.int8)
+    return qty, issue
+
+
+def compact(chunk: pd.DataFrame):
+    # Validated chunk in the compact schema (item/category codes against the reference store,
+    # float32 quantities), and the skipped rows with their issue: unknown (Waste_Item, Category),
+    # or a missing, non-numeric or negative Quantity
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {missing}")
+    ref = store.get_store()
+    item, item_raw, item_labels = _encode(chunk['Waste_Item'], ref.item_dtype)
+    category, category_raw, category_labels = _encode(chunk['Category'], ref.category_dtype)
+    known = (item >= 0) & (category >= 0)
+    known[known] = ref.known_pairs[item[known], category[known]]
+    issue = np.where(known, 0, 1).astype(np.int8)
+    if 'Quantity' in chunk.columns:
+        qty, qty_issue = _quantities(chunk['Quantity'])
+        issue[known] = qty_issue[known]
+    valid = issue == 0
+
+    out = pd.DataFrame({
+        'Waste_Item': pd.Categorical.from_codes(item[valid], dtype=ref.item_dtype),
+        'Category': pd.Categorical.from_codes(category[valid], dtype=ref.category_dtype),
+    })
+    if 'Quantity' in chunk.columns:
+        out['Quantity'] = qty[valid].astype(np.float32)
+    if 'Origin_ID' in chunk.columns:
+        out['Origin_ID'] = chunk['Origin_ID'][valid].astype('string').to_numpy()
+    for col in ('Origin_Latitude', 'Origin_Longitude'):
+        if col in chunk.columns:
+            out[col] = pd.to_numeric(chunk[col][valid], errors='coerce').to_numpy(np.float64)
+    if 'Period' in chunk.columns:
+        # Planning period labels (month numbers, dates, ...) are kept as read
+        out['Period'] = chunk['Period'][valid].to_numpy()
+    skipped = pd.DataFrame({'Waste_Item': item_labels[item_raw[~valid]], 'Category': category_labels[category_raw[~valid]],
+                            'Issue': ISSUES[issue[~valid]]})
+    return out, skipped
+
+
+def read_input(source, chunksize: int = 100_000, drop_unknown: bool = True, origins: pd.DataFrame = None):
+    # Stream an Excel/CSV/Parquet input in chunks into the compact schema; returns
+    # (user_df, origins, skipped) where skipped counts rows per (Waste_Item, Category, Issue) for
+    # unrecognized pairs and missing, non-numeric or negative quantities. Those rows are dropped
+    # unless drop_unknown=False, in which case a ValueError is raised.
+    # origins is an extra origins table for inputs without an 'Origins' sheet (CSV, Parquet);
+    # a workbook's own sheet wins for an Origin_ID listed in both.
+    kind = _file_type(source)
+    reader = {'excel': _excel_chunks, 'csv': _csv_chunks, 'parquet': _parquet_chunks}[kind]
+    extra_origins = origins
+    parts, skipped_parts, origins = [], [], None
+    for chunk, origins in reader(source, chunksize):
+        part, skipped = compact(chunk)
+        parts.append(part)
+        if len(skipped):
+            skipped_parts.append(skipped.value_counts().rename('Rows').reset_index())
+
+    user_df = pd.concat(parts, ignore_index=True) if parts else compact(pd.DataFrame(columns=REQUIRED_COLUMNS))[0]
+    if 'Origin_ID' in user_df.columns:
+        user_df['Origin_ID'] = user_df['Origin_ID'].astype('category')
+    if origins is not None and 'Origin_ID' in origins.columns:
+        origins['Origin_ID'] = origins['Origin_ID'].astype(str).str.strip()
+    origins = merge_origins(origins, extra_origins)
+    skipped = pd.DataFrame(columns=REPORT_COLUMNS)
+    if skipped_parts:
+        skipped = (pd.concat(skipped_parts).groupby(REPORT_COLUMNS[:-1], as_index=False)['Rows'].sum()
+                   .sort_values('Rows', ascending=False, kind='stable').reset_index(drop=True))
+        if not drop_unknown:
+            raise ValueError(f"{int(skipped['Rows'].sum())} rows are invalid: " + ", ".join(
+                f"{i} / {c}: {issue} ({n})" for i, c, issue, n in skipped[REPORT_COLUMNS].itertuples(index=False)))
+    if not len(user_df):
+        raise ValueError("Input has no valid rows" + (
+            f" ({int(skipped['Rows'].sum())} skipped: "
+            + ", ".join(f"{issue} ({n})" for issue, n in skipped.groupby('Issue')['Rows'].sum().items()) + ")"
+            if len(skipped) else ""))
+    return user_df, origins, skipped
@@ -0,0 +1,232 @@
+import time
+import numpy as np
+import pandas as pd
+import pulp
+import builder
+import solver as solvers
+import store
+
+PERIOD = builder.PERIOD_COLUMN
+SUMMARY_COLUMNS = [PERIOD, 'Amount_kg', 'Total_Emission_kgCO2', 'Total_Cost_Rp', 'Cumulative_Cost_Rp']
+
+
+def horizon_periods(user_df: pd.DataFrame):
+    # Distinct planning periods in order
+    if PERIOD not in user_df.columns:
+        raise ValueError(f"Input has no {PERIOD} column")
+    if user_df[PERIOD].isna().any():
+        raise ValueError(f"{int(user_df[PERIOD].isna().sum())} rows have no {PERIOD}")
+    return pd.Index(pd.unique(np.asarray(user_df[PERIOD]))).sort_values()
+
+
+def _per_period(value, periods):
+    # Scalar or {period: value} mapping -> list aligned with periods (None = no limit)
+    if value is None:
+        return [None] * len(periods)
+    if np.isscalar(value):
+        return [float(value)] * len(periods)
+    value = dict(value)
+    return [float(value[p]) if value.get(p) is not None else None for p in periods]
+
+
+def build_horizon_model(user_df: pd.DataFrame, origin_coords: tuple = None, max_budget: float = None,
+                        period_budget=None, budget_carryover: bool = False, period_capacity: float = None,
+                        capacity_scale: float = 1.0, capacities: dict = None, carry_in: float = 0.0,
+                        road_matrix=None, origins=None):
+    # One LP over all periods: time-indexed flows on the same arcs as build_model, demand and
+    # max-proportion constraints per period, facility capacity over the horizon (the store's
+    # capacity x capacity_scale, or the remaining capacities given) and optionally per period
+    # (period_capacity x the store's capacity), a cost variable per period with per-period or,
+    # with budget_carryover, cumulative budgets (unspent budget rolls forward) and a horizon budget
+    user_df, arcs, origin_cols, multi_origin = builder.build_arcs(user_df, origin_coords, road_matrix, origins)
+    ref = store.get_store()
+    periods = horizon_periods(user_df)
+    arcs['Period_Pos'] = periods.get_indexer(arcs[PERIOD])
+    row_period = periods.get_indexer(user_df[PERIOD])
+
+    model = pulp.LpProblem("Waste_Planning_kg_input_ton", pulp.LpMinimize)
+    names = ("x_" + arcs['Idx'].astype(str) + "_" + arcs['Treatment'] + "_" + arcs['Facility_ID']).tolist()
+    x = [pulp.LpVariable(n, lowBound=0, upBound=ub) for n, ub in zip(names, arcs['Quantity_kg'].tolist())]
+
+    by_row = arcs.groupby('Row', sort=True).indices
+    by_period = arcs.groupby('Period_Pos', sort=True).indices
+    by_cat_trt = arcs.groupby(['Period_Pos', 'Category', 'Treatment'], sort=False).indices
+    by_facility = arcs.groupby('Facility_ID', sort=False).indices
+    by_facility_period = arcs.groupby(['Facility_ID', 'Period_Pos'], sort=False).indices
+
+    # Demand constraints, one per row (each row belongs to one period)
+    empty = np.empty(0, dtype=int)
+    for r, (idx, qty_kg) in enumerate(zip(user_df.index.tolist(), user_df['Quantity_kg'].tolist())):
+        expr = pulp.LpAffineExpression([(x[i], 1) for i in by_row.get(r, empty)])
+        model += (expr == qty_kg, f"Demand_{idx}")
+
+    # Max-proportion constraints of each period's own category totals
+    totals = pd.Series(user_df['Quantity_kg'].to_numpy(dtype=float)).groupby(
+        [row_period, user_df['Category'].astype(str).to_numpy()]).sum().to_dict()
+    max_prop_constraints = {}
+    for t in range(len(periods)):
+        for cat, trt, prop in ref.max_prop:
+            if (t, cat) not in totals:
+                continue
+            members = by_cat_trt.get((t, cat, trt))
+            if members is not None and len(members):
+                expr = pulp.LpAffineExpression([(x[i], 1) for i in members])
+                constraint = expr <= prop * totals[(t, cat)]
+                model += (constraint, f"MaxProp_P{t + 1}_{cat.replace(' ','')}_{trt.replace(' ','')}")
+                max_prop_constraints[(periods[t], cat, trt)] = constraint
+
+    # Facility capacity over the horizon, and per period if requested
+    capacities = capacities or {fid: cap_kg * capacity_scale for fid, cap_kg in ref.facility_caps}
+    cap_constraints, period_cap_constraints = {}, {}
+    for fid, cap_kg in ref.facility_caps:
+        members = by_facility.get(fid)
+        if members is None or not len(members):
+            continue
+        expr = pulp.LpAffineExpression([(x[i], 1) for i in members])
+        constraint = expr <= capacities.get(fid, 0.0)
+        model += (constraint, f"Cap_{fid}")
+        cap_constraints[fid] = constraint
+        if period_capacity is None:
+            continue
+        for t in range(len(periods)):
+            members = by_facility_period.get((fid, t))
+            if members is not None and len(members):
+                expr = pulp.LpAffineExpression([(x[i], 1) for i in members])
+                constraint = expr <= period_capacity * cap_kg
+                model += (constraint, f"Cap_{fid}_P{t + 1}")
+                period_cap_constraints[(fid, periods[t])] = constraint
+
+    # Objective: minimize emissions (treatment + transport) over the horizon
+    model += pulp.LpAffineExpression(zip(x, arcs['Emission_Coef'].tolist())), "Total_Emission"
+
+    # Cost per period (treatment + transport; recycling can make it negative)
+    cost_coef = arcs['Cost_Coef'].tolist()
+    cost = [pulp.LpVariable(f"Cost_P{t + 1}") for t in range(len(periods))]
+    for t in range(len(periods)):
+        expr = pulp.LpAffineExpression([(x[i], cost_coef[i]) for i in by_period.get(t, empty)])
+        model += (expr - cost[t] == 0, f"Cost_P{t + 1}_Def")
+
+    # Per-period (or cumulative, with carryover) and horizon budget constraints
+    budgets = _per_period(period_budget, periods)
+    budget_constraints = {}
+    for t, budget in enumerate(budgets):
+        if budget is None:
+            continue
+        if budget_carryover:
+            if any(b is None for b in budgets[:t]):
+                raise ValueError("budget_carryover needs a budget for every period")
+            constraint = pulp.lpSum(cost[:t + 1]) <= carry_in + sum(budgets[:t + 1])
+        else:
+            constraint = cost[t] <= budget
+        model += (constraint, f"Budget_P{t + 1}")
+        budget_constraints[periods[t]] = constraint
+    if max_budget is not None:
+        model += (pulp.lpSum(cost) <= max_budget, "Budget_Constraint")
+
+    index = {
+        'arcs': arcs,
+        'vars': x,
+        'cost_vars': cost,
+        'periods': periods,
+        'by_row': by_row,
+        'by_period': by_period,
+        'by_facility': by_facility,
+        'totals': totals,
+        'max_prop_constraints': max_prop_constraints,
+        'cap_constraints': cap_constraints,
+        'period_cap_constraints': period_cap_constraints,
+        'budget_constraints': budget_constraints,
+        'origin_columns': origin_cols if multi_origin else [],
+    }
+    return model, index
+
+
+def period_summary(df_out: pd.DataFrame):
+    # Amount, emission and cost per period, with the running cost
+    summary = df_out.groupby(PERIOD, sort=True)[['Amount_kg', 'Total_Emission_kgCO2', 'Total_Cost_Rp']].sum().reset_index()
+    summary['Cumulative_Cost_Rp'] = summary['Total_Cost_Rp'].cumsum()
+    return summary[SUMMARY_COLUMNS]
+
+
+def facility_usage(df_out: pd.DataFrame):
+    # kg treated per facility (rows) and period (columns)
+    return df_out.pivot_table(index='TPA_Name', columns=PERIOD, values='Amount_kg', aggfunc='sum', fill_value=0.0)
+
+
+def _solve_horizon(user_df, aggregate, solver, build_kwargs):
+    start = time.perf_counter()
+    codes = shares = None
+    if aggregate:
+        user_df, codes, shares = builder.aggregate_rows(user_df, builder.AGGREGATE_KEYS + (PERIOD,))
+    model, index = build_horizon_model(user_df, **build_kwargs)
+    status, telemetry = solvers.solve(model, solver, build_s=time.perf_counter() - start)
+    return status, telemetry, index, codes, shares
+
+
+def optimize_horizon(user_df: pd.DataFrame, max_budget: float = None, origin_coords: tuple = None,
+                     period_budget=None, budget_carryover: bool = False, period_capacity: float = None,
+                     capacity_scale: float = 1.0, window: int = None, step: int = 1, aggregate: bool = True,
+                     road_matrix=None, origins=None, solver=None, log_path: str = None):
+    # Multi-period plan for an input with a Period column; returns (results, period summary,
+    # status, telemetry). window=None solves the whole horizon as one model; otherwise each
+    # model covers `window` periods, commits the first `step` of them and hands the remaining
+    # capacity and budget to the next (window=1 is a per-period decomposition)
+    user_df = builder.resolve_origins(user_df, origin_coords, origins)
+    periods = horizon_periods(user_df)
+    build_kwargs = dict(origin_coords=origin_coords, period_budget=period_budget, budget_carryover=budget_carryover,
+                        period_capacity=period_capacity, road_matrix=road_matrix, origins=origins)
+    if window is None or window >= len(periods):
+        status, telemetry, index, codes, shares = _solve_horizon(
+            user_df, aggregate, solver, dict(build_kwargs, max_budget=max_budget, capacity_scale=capacity_scale))
+        telemetry['windows'] = 1
+        results = [builder.collect_results(index, codes, shares)]
+    else:
+        ref = store.get_store()
+        step = max(1, min(step, window))
+        budgets = dict(zip(periods, _per_period(period_budget, periods)))
+        remaining = {fid: cap_kg * capacity_scale for fid, cap_kg in ref.facility_caps}
+        budget_left, carry_in = max_budget, 0.0
+        results, status, telemetry = [], 'Optimal', None
+        for first in range(0, len(periods), step):
+            window_periods, commit = periods[first:first + window], periods[first:first + step]
+            sub = user_df[user_df[PERIOD].isin(window_periods)]
+            win_status, win_telemetry, index, codes, shares = _solve_horizon(
+                sub, aggregate, solver,
+                dict(build_kwargs, max_budget=budget_left, capacities=dict(remaining), carry_in=carry_in))
+            telemetry = win_telemetry if telemetry is None else {
+                **win_telemetry,
+                'build_s': telemetry['build_s'] + win_telemetry['build_s'],
+                'solve_s': telemetry['solve_s'] + win_telemetry['solve_s'],
+                'variables': max(telemetry['variables'], win_telemetry['variables']),
+                'constraints': max(telemetry['constraints'], win_telemetry['constraints']),
+            }
+            if win_status != 'Optimal':
+                # Report the failing window's periods, as optimize_waste reports a failed solve
+                status = win_status
+                res = builder.collect_results(index, codes, shares)
+                results.append(res[res[PERIOD].isin(commit)])
+                break
+
+            # Commit the first periods of the window and carry their usage forward
+            arcs = index['arcs']
+            amounts = np.array([v.varValue or 0 for v in index['vars']], dtype=float)
+            keep = arcs[PERIOD].isin(commit).to_numpy()
+            used = pd.Series(amounts[keep]).groupby(arcs['Facility_ID'].to_numpy()[keep]).sum()
+            for fid, kg in used.items():
+                remaining[fid] = remaining.get(fid, 0.0) - kg
+            spent = float(np.dot(amounts[keep], arcs['Cost_Coef'].to_numpy()[keep]))
+            if budget_left is not None:
+                budget_left -= spent
+            if budget_carryover and period_budget is not None:
+                carry_in += sum(budgets[p] for p in commit) - spent
+            res = builder.collect_results(index, codes, shares)
+            results.append(res[res[PERIOD].isin(commit)])
+        telemetry['status'] = status
+        telemetry['windows'] = len(results)
+
+    df_out = pd.concat(results, ignore_index=True)
+    telemetry['objective'] = df_out['Total_Emission_kgCO2'].sum()
+    if log_path:
+        solvers.log_telemetry(telemetry, log_path, rows=len(user_df), periods=len(periods), max_budget=max_budget,
+                              window=window)
+    return df_out, period_summary(df_out), status, telemetry
@@ -0,0 +1,95 @@
+import hashlib
+import time
+from collections import OrderedDict
+import pandas as pd
+import builder
+import solver as solvers
+import store
+
+
+def input_key(user_df: pd.DataFrame, *params):
+    # Stable hash of an input sheet and the parameters of a run
+    h = hashlib.sha1(pd.util.hash_pandas_object(user_df, index=True).to_numpy().tobytes())
+    h.update(repr(params).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ModelSession:
+    # Keeps one built model and its variable/constraint handles for what-if edits; edits change
+    # bounds and RHS values in place so the model is never rebuilt (each re-solve still starts
+    # the solver from scratch) and results are memoized by a hash of the inputs and the current edits
+
+    def __init__(self, user_df: pd.DataFrame, max_budget: float, origin_coords: tuple = None,
+                 road_matrix=None, origins: pd.DataFrame = None, solver=None, cache_size: int = 64):
+        start = time.perf_counter()
+        user_df = builder.resolve_origins(user_df, origin_coords, origins)
+        self.key = input_key(user_df, max_budget, sorted((road_matrix or {}).items(), key=repr),
+                             store.get_store().digest)
+        commodities, self.codes, self.shares = builder.aggregate_rows(user_df)
+        self.model, self.index = builder.build_model(commodities, max_budget, origin_coords, road_matrix, origins)
+        self.build_s = time.perf_counter() - start
+        self.solver = solver or solvers.make_solver()
+        self.upper_bounds = self.index['arcs']['Quantity_kg'].to_numpy()
+        self.closed = set()
+        self.max_prop = {(cat, trt): prop for cat, trt, prop in store.get_store().max_prop}
+        self.capacities = dict(store.get_store().facility_caps)
+        self.budget = float(max_budget)
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+
+    def close_facility(self, fid: str):
+        # No flow into fid (variable upper bounds set to 0)
+        for i in self.index['by_facility'].get(fid, ()):
+            self.index['vars'][i].upBound = 0
+        self.closed.add(fid)
+
+    def open_facility(self, fid: str):
+        for i in self.index['by_facility'].get(fid, ()):
+            self.index['vars'][i].upBound = self.upper_bounds[i]
+        self.closed.discard(fid)
+
+    def set_closed(self, fids):
+        for fid in self.closed - set(fids):
+            self.open_facility(fid)
+        for fid in set(fids) - self.closed:
+            self.close_facility(fid)
+
+    def set_max_proportion(self, category: str, treatment: str, prop: float):
+        # RHS of MaxProp_<category>_<treatment>; pairs without a constraint have no flows to limit
+        self.max_prop[(category, treatment)] = float(prop)
+        constraint = self.index['max_prop_constraints'].get((category, treatment))
+        if constraint is not None:
+            constraint.constant = -float(prop) * self.index['totals'][category]
+
+    def set_capacity(self, fid: str, capacity_t: float):
+        # RHS of Cap_<fid>, capacity in tons as in data.facility_capacity_data
+        self.capacities[fid] = float(capacity_t) * 1000.0
+        constraint = self.index['cap_constraints'].get(fid)
+        if constraint is not None:
+            constraint.constant = -self.capacities[fid]
+
+    def set_budget(self, max_budget: float):
+        self.budget = float(max_budget)
+        self.model.constraints['Budget_Constraint'].constant = -self.budget
+
+    def state_key(self):
+        return (self.key, self.budget, tuple(sorted(self.closed)),
+                tuple(sorted(self.max_prop.items())), tuple(sorted(self.capacities.items())))
+
+    def solve(self, log_path: str = None):
+        # (results, total emission, total cost, status, telemetry), as optimize_waste returns
+        key = self.state_key()
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        status, telemetry = solvers.solve(self.model, self.solver, build_s=self.build_s)
+        self.build_s = 0.0
+        if log_path:
+            solvers.log_telemetry(telemetry, log_path, rows=len(self.codes), max_budget=self.budget,
+                                  closed=sorted(self.closed))
+        df_out = builder.collect_results(self.index, self.codes, self.shares)
+        result = (df_out, df_out['Total_Emission_kgCO2'].sum(), df_out['Total_Cost_Rp'].sum(), status, telemetry)
+        self._results[key] = result
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return result
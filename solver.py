@@ -0,0 +1,89 @@
+import json
+import time
+import pulp
+
+# Backend name -> PuLP solver classes in order of preference
+BACKENDS = {
+    'cbc': ['PULP_CBC_CMD', 'COIN_CMD'],
+    'highs': ['HiGHS', 'HiGHS_CMD'],
+    'glpk': ['GLPK_CMD', 'PYGLPK'],
+}
+
+
+def available_backends():
+    available = set(pulp.listSolvers(onlyAvailable=True))
+    return [name for name, classes in BACKENDS.items() if available.intersection(classes)]
+
+
+def make_solver(backend: str = 'cbc', threads: int = None, time_limit: float = None, gap_rel: float = None,
+                tolerance: float = None, msg: bool = False, warm_start: bool = False):
+    # PuLP solver for the backend with the options it understands; tolerance sets the
+    # primal/dual feasibility tolerance, gap_rel only matters for MIP models. Options the
+    # backend cannot apply raise a ValueError rather than being ignored (warm_start, a MIP
+    # solution start, is only a hint: it is skipped where unsupported and LPs ignore it)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown solver backend '{backend}', expected one of {sorted(BACKENDS)}")
+    available = set(pulp.listSolvers(onlyAvailable=True))
+    names = [n for n in BACKENDS[backend] if n in available]
+    if not names:
+        raise ValueError(f"Solver backend '{backend}' is not installed")
+    name = names[0]
+
+    kwargs = {'msg': msg, 'timeLimit': time_limit}
+    options, unsupported = [], []
+    if name in ('PULP_CBC_CMD', 'COIN_CMD'):
+        kwargs.update(threads=threads, gapRel=gap_rel, warmStart=warm_start)
+        if tolerance is not None:
+            options += [f"primalTolerance {tolerance}", f"dualTolerance {tolerance}"]
+    elif name == 'HiGHS_CMD':
+        kwargs.update(threads=threads, gapRel=gap_rel, warmStart=warm_start)
+        if tolerance is not None:
+            options += [f"primal_feasibility_tolerance={tolerance}", f"dual_feasibility_tolerance={tolerance}"]
+    elif name == 'HiGHS':
+        kwargs.update(gapRel=gap_rel, warmStart=warm_start)
+        if threads is not None:
+            kwargs['threads'] = threads
+        if tolerance is not None:
+            kwargs.update(primal_feasibility_tolerance=tolerance, dual_feasibility_tolerance=tolerance)
+    elif name in ('GLPK_CMD', 'PYGLPK'):
+        # GLPK is single-threaded and takes no feasibility tolerance; glpsol has --mipgap
+        if threads not in (None, 1):
+            unsupported.append('threads')
+        if tolerance is not None:
+            unsupported.append('tolerance')
+        if gap_rel is not None:
+            if name == 'GLPK_CMD':
+                options += ['--mipgap', str(gap_rel)]
+            else:
+                unsupported.append('gap_rel')
+    if unsupported:
+        raise ValueError(f"Solver backend '{backend}' ({name}) does not support: {', '.join(unsupported)}")
+    if options:
+        kwargs['options'] = options
+    return pulp.getSolver(name, **{k: v for k, v in kwargs.items() if v is not None})
+
+
+def solve(model: pulp.LpProblem, solver=None, build_s: float = None):
+    # Solve and return (status, telemetry) with timings, model size and objective
+    solver = solver or pulp.LpSolverDefault
+    start = time.perf_counter()
+    model.solve(solver)
+    solve_s = time.perf_counter() - start
+    status = pulp.LpStatus.get(model.status, "Unknown")
+    telemetry = {
+        'solver': solver.name,
+        'status': status,
+        'build_s': round(build_s, 4) if build_s is not None else None,
+        'solve_s': round(solve_s, 4),
+        'variables': model.numVariables(),
+        'constraints': model.numConstraints(),
+        'objective': pulp.value(model.objective),
+    }
+    return status, telemetry
+
+
+def log_telemetry(telemetry: dict, path: str, **extra):
+    # Append one JSON record per solve
+    record = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), **extra, **telemetry}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, default=str) + "\n")
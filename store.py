@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import types
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+import data
+
+# On-disk reference files: {"format": ..., "format_version": ..., "version": ..., "tables": {...}}
+FILE_FORMAT = 'waste-reference'
+FORMAT_VERSION = 1
+TABLES = ('treatments', 'transport', 'locations', 'facility_capacity', 'max_prop', 'facility_rules')
+
+# Environment variable naming a reference file to load instead of data.py
+REFERENCE_ENV = 'WASTE_REFERENCE_FILE'
+
+
+@dataclass(frozen=True)
+class ReferenceStore:
+    # Compiled, read-only reference data; facilities are indexed in locations order
+    version: str
+    digest: str
+    item_dtype: pd.CategoricalDtype
+    category_dtype: pd.CategoricalDtype
+    known_pairs: np.ndarray          # [item code, category code] -> has a treatment
+    facility_ids: pd.Index
+    facility_names: np.ndarray
+    facility_lat: np.ndarray
+    facility_lon: np.ndarray
+    facility_caps: tuple             # (Facility_ID, capacity kg) in capacity-table order
+    arcs: pd.DataFrame               # (Waste_Item, Category) -> feasible (Treatment, Facility_ID)
+    modes: pd.DataFrame              # transport modes per kg
+    mode_caps: np.ndarray            # sorted distinct mode capacities (kg)
+    mode_best: np.ndarray            # best mode position per capacity suffix, last = overall
+    max_prop: tuple                  # (Category, Treatment, Max_Proportion)
+    facility_rules: types.MappingProxyType
+
+
+def tables_from_data():
+    # Raw reference tables as defined in data.py
+    return {
+        'treatments': data.treatments_data,
+        'transport': data.transport_data,
+        'locations': data.locations_data,
+        'facility_capacity': data.facility_capacity_data,
+        'max_prop': data.max_prop_data,
+        'facility_rules': data.facility_rules,
+    }
+
+
+def _frozen(arr):
+    arr = np.asarray(arr)
+    arr.setflags(write=False)
+    return arr
+
+
+def compile_store(tables: dict, version: str = 'builtin'):
+    # Normalize units (ton -> kg) and precompute every lookup the model builder needs
+    treatments_df = pd.DataFrame(tables['treatments']).reset_index(drop=True)
+    locations_df = pd.DataFrame(tables['locations'])
+    capacity_df = pd.DataFrame(tables['facility_capacity'])
+    capacity_df['Capacity'] = capacity_df['Capacity'].astype(float) * 1000.0
+    facility_df = capacity_df.merge(locations_df, on='Facility_ID').rename(columns={'Capacity': 'Max_Capacity'})
+    facility_rules = tables['facility_rules']
+
+    # Facility rules as a flat (Facility_ID, Category, Treatment) table, in rule order;
+    # a facility only serves a treatment it has a capacity entry for
+    rules = pd.DataFrame(
+        [(order, fid, cat, tr)
+         for order, (fid, r) in enumerate(facility_rules.items())
+         for cat in r['Category'] for tr in r['Treatment']],
+        columns=['Rule_Order', 'Facility_ID', 'Category', 'Treatment']
+    )
+    rules = rules.merge(facility_df[['Facility_ID', 'Treatment']].drop_duplicates(), on=['Facility_ID', 'Treatment'])
+    arcs = (
+        treatments_df.reset_index().rename(columns={'index': 'Treatment_Row'})
+        .merge(rules, on=['Category', 'Treatment'])
+        .sort_values(['Treatment_Row', 'Rule_Order'], kind='stable')
+        .reset_index(drop=True)
+    )
+    facilities = facility_df.drop_duplicates('Facility_ID').set_index('Facility_ID')
+    arcs['Latitude'] = arcs['Facility_ID'].map(facilities['Latitude']).astype(float)
+    arcs['Longitude'] = arcs['Facility_ID'].map(facilities['Longitude']).astype(float)
+    arcs['Location'] = arcs['Facility_ID'].map(locations_df.set_index('Facility_ID')['Location'])
+    arcs = arcs[['Waste_Item', 'Category', 'Treatment', 'Facility_ID', 'Location',
+                 'Emission_Factor', 'Treatment_Cost', 'Latitude', 'Longitude']]
+
+    # Transport modes per kg; for a load of x kg the eligible modes have Max_Capacity >= x
+    modes = pd.DataFrame(tables['transport']).reset_index(drop=True)
+    modes['Emission_per_kg'] = modes['Emission_per_ton'] / 1000.0
+    modes['Cost_per_kg'] = modes['Cost_per_ton'] / 1000.0 if 'Cost_per_ton' in modes.columns else 0.0
+    modes['Max_Capacity'] = modes['Max_Capacity'].astype(float) * 1000.0
+    mode_caps = np.sort(modes['Max_Capacity'].unique())
+    mode_best = [modes[modes['Max_Capacity'] >= cap].nsmallest(1, 'Emission_per_kg').index[0] for cap in mode_caps]
+    mode_best.append(modes.nsmallest(1, 'Emission_per_kg').index[0])
+
+    item_dtype = pd.CategoricalDtype(sorted(treatments_df['Waste_Item'].unique()))
+    category_dtype = pd.CategoricalDtype(sorted(treatments_df['Category'].unique()))
+    known_pairs = np.zeros((len(item_dtype.categories), len(category_dtype.categories)), dtype=bool)
+    known_pairs[item_dtype.categories.get_indexer(treatments_df['Waste_Item']),
+                category_dtype.categories.get_indexer(treatments_df['Category'])] = True
+
+    digest = hashlib.sha1(json.dumps(tables, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return ReferenceStore(
+        version=version,
+        digest=digest,
+        item_dtype=item_dtype,
+        category_dtype=category_dtype,
+        known_pairs=_frozen(known_pairs),
+        facility_ids=pd.Index(locations_df['Facility_ID']),
+        facility_names=_frozen(locations_df['Location'].to_numpy()),
+        facility_lat=_frozen(locations_df['Latitude'].to_numpy(dtype=float)),
+        facility_lon=_frozen(locations_df['Longitude'].to_numpy(dtype=float)),
+        facility_caps=tuple((fid, float(cap)) for fid, cap in facilities['Max_Capacity'].items()),
+        arcs=arcs,
+        modes=modes,
+        mode_caps=_frozen(mode_caps),
+        mode_best=_frozen(np.array(mode_best)),
+        max_prop=tuple((cat, trt, float(prop)) for cat, trt, prop in
+                       pd.DataFrame(tables['max_prop'])[['Category', 'Treatment', 'Max_Proportion']].itertuples(index=False)),
+        facility_rules=types.MappingProxyType({fid: types.MappingProxyType(r) for fid, r in facility_rules.items()}),
+    )
+
+
+def save_tables(path: str, tables: dict = None, version: str = 'builtin'):
+    # Write reference tables (data.py by default) as a versioned JSON file
+    doc = {'format': FILE_FORMAT, 'format_version': FORMAT_VERSION, 'version': version,
+           'tables': tables or tables_from_data()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(doc, f, indent=1)
+
+
+def load_store(path: str):
+    # Compile a store from a versioned reference file
+    with open(path, encoding='utf-8') as f:
+        doc = json.load(f)
+    if doc.get('format') != FILE_FORMAT or doc.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} {FILE_FORMAT} file")
+    missing = [t for t in TABLES if t not in doc.get('tables', {})]
+    if missing:
+        raise ValueError(f"{path} is missing reference tables: {missing}")
+    return compile_store(doc['tables'], str(doc.get('version', os.path.basename(path))))
+
+
+def activate(path: str = None):
+    # Make the store from path (or data.py) the one used by every model build
+    global _store
+    _store = load_store(path) if path else compile_store(tables_from_data())
+    return _store
+
+
+def get_store():
+    return _store
+
+
+# Compiled once at import, from the reference file in the environment if one is set
+_store = None
+activate(os.environ.get(REFERENCE_ENV))
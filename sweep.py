@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pulp
+import builder
+
+# Model shared by the solves of one worker process
+_worker_model = None
+
+
+def set_budget(model: pulp.LpProblem, budget: float):
+    # Change only the RHS of Budget_Constraint (stored as lhs - budget <= 0)
+    model.constraints['Budget_Constraint'].constant = -float(budget)
+
+
+def model_totals(model: pulp.LpProblem):
+    # Emission (objective) and cost (Budget_Constraint LHS) of the current solution
+    emission = sum(c * (v.varValue or 0) for v, c in model.objective.items())
+    cost = sum(c * (v.varValue or 0) for v, c in model.constraints['Budget_Constraint'].items())
+    return emission, cost
+
+
+def budget_range(model: pulp.LpProblem, solver=None):
+    # epsilon-constraint bounds: the cheapest feasible cost, and the cost of the
+    # unconstrained minimum-emission plan (more budget cannot lower emissions further)
+    solver = solver or pulp.PULP_CBC_CMD(msg=False)
+    objective = model.objective
+    budget = model.constraints.pop('Budget_Constraint')
+    try:
+        model.setObjective(pulp.LpAffineExpression(budget.items()))
+        model.solve(solver)
+        if model.status != pulp.LpStatusOptimal:
+            raise ValueError(f"No feasible plan at any budget ({pulp.LpStatus[model.status]})")
+        # Nudge above the minimum so the written LP's rounded RHS stays feasible
+        cost_min = pulp.value(model.objective)
+        cost_min += max(abs(cost_min), 1.0) * 1e-7
+        model.setObjective(objective)
+        model.solve(solver)
+        cost_max = sum(c * (v.varValue or 0) for v, c in budget.items())
+    finally:
+        model.setObjective(objective)
+        model.constraints['Budget_Constraint'] = budget
+    return cost_min, max(cost_min, cost_max)
+
+
+def solve_budgets(model: pulp.LpProblem, budgets, solver=None):
+    # Re-solve one model over ascending budgets, changing only the Budget_Constraint RHS between
+    # solves; the model is never rebuilt, but each solve starts from scratch (CBC ignores a
+    # solution start for an LP)
+    solver = solver or pulp.PULP_CBC_CMD(msg=False)
+    rows = []
+    for budget in budgets:
+        set_budget(model, budget)
+        model.solve(solver)
+        status = pulp.LpStatus.get(model.status, "Unknown")
+        emission, cost = model_totals(model) if model.status == pulp.LpStatusOptimal else (np.nan, np.nan)
+        rows.append({
+            'Budget_Rp': float(budget),
+            'Status': status,
+            'Total_Emission_kgCO2': emission,
+            'Total_Cost_Rp': cost,
+        })
+    return rows
+
+
+def _init_worker(model_dict):
+    global _worker_model
+    _, _worker_model = pulp.LpProblem.from_dict(model_dict)
+
+
+def _solve_chunk(budgets, solver):
+    return solve_budgets(_worker_model, budgets, solver)
+
+
+def sweep_budgets(user_df: pd.DataFrame, budgets=None, n_points: int = 20, origin_coords: tuple = None,
+                  workers: int = None, solver=None, road_matrix=None, origins=None):
+    # Emission vs. budget table from one model build; without explicit budgets the
+    # epsilon-constraint range between the cheapest and the minimum-emission plan is swept
+    user_df = builder.resolve_origins(user_df, origin_coords, origins)
+    commodities, _, _ = builder.aggregate_rows(user_df)
+    model, _ = builder.build_model(commodities, 0.0, origin_coords, road_matrix, origins)
+
+    if budgets is None:
+        cost_min, cost_max = budget_range(model, solver)
+        budgets = np.linspace(cost_min, cost_max, n_points)
+    budgets = np.sort(np.asarray(budgets, dtype=float))
+
+    # Budget chunks per process, each solved on the worker's own copy of the model
+    workers = max(1, min(workers or os.cpu_count() or 1, len(budgets)))
+    if workers == 1:
+        rows = solve_budgets(model, budgets, solver)
+    else:
+        chunks = np.array_split(budgets, workers)
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model.to_dict(),)) as pool:
+            rows = [r for part in pool.map(_solve_chunk, chunks, [solver] * len(chunks)) for r in part]
+    return pd.DataFrame(rows, columns=['Budget_Rp', 'Status', 'Total_Emission_kgCO2', 'Total_Cost_Rp'])
+
+
+def pareto_front(sweep_df: pd.DataFrame):
+    # Optimal points not dominated in (cost, emission)
+    df = sweep_df[sweep_df['Status'] == 'Optimal'].sort_values(['Total_Cost_Rp', 'Total_Emission_kgCO2'])
+    best = df['Total_Emission_kgCO2'].cummin()
+    keep = df['Total_Emission_kgCO2'] <= best.shift(fill_value=np.inf) - 1e-9
+    return df[keep].reset_index(drop=True)
@@ -0,0 +1,127 @@
+import copy
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import builder
+import session
+import solver as solvers
+import store
+
+ORIGIN = (-6.9, 107.6)
+BUDGET = 1e9
+BASELINE_LP = os.path.join(os.path.dirname(__file__), 'data', 'baseline_small.lp')
+
+# Repeated Waste_Item/Category pairs (aggregated), with quantities that need different transport modes
+ROWS = [
+    ('Paper', 'Non-Hazardous Waste', 2.5),
+    ('Paper', 'Non-Hazardous Waste', 2.5),
+    ('Paper', 'Non-Hazardous Waste', 0.3),
+    ('Plastic', 'Non-Hazardous Waste', 12.0),
+    ('Plastic', 'Non-Hazardous Waste', 4.75),
+    ('Household Waste', 'Non-Hazardous Waste', 30.0),
+    ('Wood', 'Non-Hazardous Waste', 1.2),
+    ('Sludge', 'Hazardous Waste', 3.4),
+    ('Sludge', 'Hazardous Waste', 3.4),
+    ('Electronic Waste', 'Hazardous Waste', 0.8),
+]
+
+
+@pytest.fixture
+def user_df():
+    return pd.DataFrame(ROWS, columns=['Waste_Item', 'Category', 'Quantity'])
+
+
+@pytest.fixture
+def edit_store(monkeypatch):
+    # Compile an edited copy of the reference tables as the active store, restored after the test
+    def activate(edit):
+        tables = copy.deepcopy(store.tables_from_data())
+        edit(tables)
+        monkeypatch.setattr(store, '_store', store.compile_store(tables, 'edited'))
+    return activate
+
+
+def solve(user_df, max_budget=BUDGET, aggregate=True):
+    return builder.optimize_waste(user_df, max_budget, ORIGIN, aggregate=aggregate, solver=solvers.make_solver())
+
+
+def test_per_row_model_matches_baseline(user_df, tmp_path):
+    # Without aggregation the LP is the one the original single-file optimize_waste built;
+    # the fixture was written after its solve, which names the objective OBJ
+    model, _ = builder.build_model(builder.resolve_origins(user_df, ORIGIN), BUDGET, ORIGIN)
+    model.solve(solvers.make_solver())
+    model.writeLP(str(tmp_path / 'model.lp'))
+    with open(BASELINE_LP, encoding='utf-8') as expected, open(tmp_path / 'model.lp', encoding='utf-8') as actual:
+        assert actual.read() == expected.read()
+
+
+def _cheap_small_modes(tables):
+    # Small vehicles cleanest per ton, so rows of one Waste_Item/Category need different modes
+    for row in tables['transport']:
+        row['Emission_per_ton'] = {'Tossa motor': 1e-05, 'Pickup': 1e-04}.get(row['Mode'], row['Emission_per_ton'])
+
+
+@pytest.mark.parametrize('max_budget', [BUDGET, 2.2e7])
+@pytest.mark.parametrize('transport', [None, _cheap_small_modes], ids=['builtin', 'cheap_small_modes'])
+def test_aggregation_keeps_objective(user_df, edit_store, max_budget, transport):
+    if transport is not None:
+        edit_store(transport)
+    _, emission, cost, status, telemetry = solve(user_df, max_budget)
+    _, row_emission, _, row_status, row_telemetry = solve(user_df, max_budget, aggregate=False)
+    assert status == row_status == 'Optimal'
+    assert telemetry['objective'] == pytest.approx(row_telemetry['objective'], rel=1e-6)
+    assert emission == pytest.approx(row_emission, rel=1e-6)
+    assert cost <= max_budget * (1 + 1e-9)
+
+
+def test_disaggregation_keeps_row_quantities(user_df):
+    # Every input row gets back exactly its own quantity, split over the commodity's arcs
+    df = builder.resolve_origins(user_df, ORIGIN)
+    commodities, codes, shares = builder.aggregate_rows(df)
+    assert len(commodities) < len(df)
+    model, index = builder.build_model(commodities, BUDGET, ORIGIN)
+    model.solve(solvers.make_solver())
+    amounts = np.array([v.varValue or 0 for v in index['vars']], dtype=float)
+    _, row_amounts = builder.disaggregate(index, amounts, codes, shares)
+    n_arcs = np.bincount(index['arcs']['Row'].to_numpy(), minlength=len(commodities))[codes]
+    per_row = np.bincount(np.repeat(np.arange(len(codes)), n_arcs), weights=row_amounts, minlength=len(codes))
+    np.testing.assert_allclose(per_row, user_df['Quantity'].to_numpy() * 1000.0, rtol=1e-9)
+
+    res = builder.collect_results(index, codes, shares)
+    totals = res.groupby('Waste_Item')['Amount_kg'].sum()
+    expected = user_df.groupby('Waste_Item')['Quantity'].sum() * 1000.0
+    pd.testing.assert_series_equal(totals.sort_index(), expected.sort_index(), check_names=False, atol=1e-2)
+
+
+def _set_max_prop(tables, category, treatment, prop):
+    for row in tables['max_prop']:
+        if (row['Category'], row['Treatment']) == (category, treatment):
+            row['Max_Proportion'] = prop
+
+
+def _set_capacity(tables, fid, capacity_t):
+    for row in tables['facility_capacity']:
+        if row['Facility_ID'] == fid:
+            row['Capacity'] = capacity_t
+
+
+@pytest.mark.parametrize('edit, rebuild, rebuild_budget', [
+    (lambda s: s.set_max_proportion('Non-Hazardous Waste', 'Open Dump', 0.65),
+     lambda t: _set_max_prop(t, 'Non-Hazardous Waste', 'Open Dump', 0.65), BUDGET),
+    (lambda s: s.set_capacity('TPA007', 3.0), lambda t: _set_capacity(t, 'TPA007', 3.0), BUDGET),
+    (lambda s: s.close_facility('TPA005'), lambda t: _set_capacity(t, 'TPA005', 0.0), BUDGET),
+    (lambda s: s.set_budget(2.2e7), lambda t: None, 2.2e7),
+], ids=['max_proportion', 'capacity', 'close_facility', 'budget'])
+def test_session_edit_matches_rebuild(user_df, edit_store, edit, rebuild, rebuild_budget):
+    sess = session.ModelSession(user_df, BUDGET, ORIGIN)
+    _, base_emission, _, _, _ = sess.solve()
+    edit(sess)
+    _, emission, cost, status, _ = sess.solve()
+
+    edit_store(rebuild)
+    _, ref_emission, ref_cost, ref_status, _ = solve(user_df, rebuild_budget)
+    assert status == ref_status == 'Optimal'
+    assert emission == pytest.approx(ref_emission, rel=1e-6)
+    assert emission != pytest.approx(base_emission, rel=1e-6)
+